@@ -1,6 +1,7 @@
+import functools
 import re
 from datetime import datetime, date, timedelta
-from collections import defaultdict
+import numpy as np
 import streamlit as st
 
 
@@ -8,38 +9,81 @@ import streamlit as st
 # Regex patterns
 # -----------------------------
 
-# Accept puzzle numbers like 1689 or 1,689
-WORDLE_PAT = re.compile(
-    r"\bWordle\s+(?P<puzzle>[\d,]+)\s+(?P<result>([1-6]/6|X/6))",
-    re.IGNORECASE,
+# One pattern for the whole export: both WhatsApp line formats (with or
+# without brackets, times with or without seconds) fused with the Wordle
+# score ("Wordle 1689 3/6", puzzle numbers like 1689 or 1,689).  Scanning
+# the raw buffer with finditer keeps the loop in the C regex engine and
+# lines without a Wordle score never produce a match at all.
+CHAT_PAT = re.compile(
+    r"^(?:"
+    r"\[(?P<d1>\d{1,2}/\d{1,2}/\d{2,4}), (?P<t1>\d{1,2}:\d{2}(?::\d{2})?)\] "
+    r"|"
+    r"(?P<d2>\d{1,2}/\d{1,2}/\d{2,4}), (?P<t2>\d{1,2}:\d{2}(?::\d{2})?) - "
+    r")"
+    r"(?P<name>[^\n]*?): [^\n]*?"
+    r"\bWordle[^\S\n]+(?P<puzzle>[\d,]+)[^\S\n]+(?P<result>[1-6]/6|X/6)",
+    re.IGNORECASE | re.MULTILINE,
 )
 
-# Accept times with or without seconds
-LINE_PATS = [
-    re.compile(
-        r"^(?P<d>\d{1,2}/\d{1,2}/\d{2,4}), (?P<t>\d{1,2}:\d{2}(?::\d{2})?) - (?P<name>.*?): (?P<msg>.*)$"
-    ),
-    re.compile(
-        r"^\[(?P<d>\d{1,2}/\d{1,2}/\d{2,4}), (?P<t>\d{1,2}:\d{2}(?::\d{2})?)\] (?P<name>.*?): (?P<msg>.*)$"
-    ),
-]
+# Separators accepted in the double-points dates text box.
+_DOUBLE_SPLIT = re.compile(r"[,\n]+")
 
 
 # -----------------------------
 # Helpers
 # -----------------------------
 
+@functools.lru_cache(maxsize=4096)
 def parse_dt(d_str: str, t_str: str, prefer_dmy: bool) -> datetime:
-    """Parse WhatsApp export date + time."""
+    """Parse WhatsApp export date + time.
+
+    Cached: exports contain many messages per day, so the same date/time
+    tokens repeat thousands of times and hit the cache.  Cache misses parse
+    the fixed export formats with direct int conversion, which skips
+    strptime's format walking and locale tables; anything unusual falls
+    back to the strptime loop.
+    """
+    try:
+        a, b, year = map(int, d_str.split("/"))
+        hh, mi, *ss = map(int, t_str.split(":"))
+    except ValueError:
+        return _parse_dt_strptime(d_str, t_str, prefer_dmy)
+
+    if year < 100:
+        year += 2000
+    day, month = (a, b) if prefer_dmy else (b, a)
+    # Mirror the strptime loop's order fallback: if the preferred order is
+    # impossible but the other one isn't, swap.
+    if month > 12 and day <= 12:
+        day, month = month, day
+
+    try:
+        return datetime(year, month, day, hh, mi, ss[0] if ss else 0)
+    except ValueError:
+        return _parse_dt_strptime(d_str, t_str, prefer_dmy)
+
+
+# Remembers the last date format that worked, so after the first line of a
+# chat every later date parses with a single strptime attempt.
+_last_date_fmt = None
+
+
+def _parse_dt_strptime(d_str: str, t_str: str, prefer_dmy: bool) -> datetime:
+    global _last_date_fmt
+
     if prefer_dmy:
         fmts = ["%d/%m/%Y", "%d/%m/%y", "%m/%d/%Y", "%m/%d/%y"]
     else:
         fmts = ["%m/%d/%Y", "%m/%d/%y", "%d/%m/%Y", "%d/%m/%y"]
 
+    if _last_date_fmt in fmts:
+        fmts = [_last_date_fmt] + [f for f in fmts if f != _last_date_fmt]
+
     parsed_date = None
     for fmt in fmts:
         try:
             parsed_date = datetime.strptime(d_str, fmt).date()
+            _last_date_fmt = fmt
             break
         except ValueError:
             continue
@@ -55,37 +99,127 @@ def parse_dt(d_str: str, t_str: str, prefer_dmy: bool) -> datetime:
 
 
 def score_from_result(result: str) -> float:
-    result = result.upper()
-    if result.startswith("X/"):
-        return 0.5
-    guesses = int(result.split("/")[0])
-    return float(7 - guesses)
+    # CHAT_PAT constrains the shape to "1/6".."6/6" or "X/6" (any case),
+    # so the first character is all that matters.
+    return 0.5 if result[0] in "Xx" else float(7 - int(result[0]))
 
 
 def fmt_pts(x: float) -> str:
-    return str(int(x)) if abs(x - round(x)) < 1e-9 else f"{x:.1f}"
+    # Points are 0.5-aligned, so exact integer comparison is safe.
+    i = int(x)
+    return str(i) if x == i else f"{x:.1f}"
 
 
 def parse_double_dates(text: str):
-    dates = set()
-    for part in re.split(r"[,\n]+", text.strip()):
+    """Split the double-dates text into valid ISO dates and rejected parts."""
+    valid = set()
+    invalid = []
+    for part in _DOUBLE_SPLIT.split(text.strip()):
         p = part.strip()
         if not p:
             continue
         try:
             datetime.strptime(p, "%Y-%m-%d")
-            dates.add(p)
+            valid.add(p)
         except ValueError:
-            pass
-    return dates
+            invalid.append(p)
+    return valid, invalid
+
+
+@st.cache_data
+def parse_chat(file_bytes: bytes, prefer_dmy: bool):
+    """Parse a WhatsApp export into first submissions per (player, puzzle).
+
+    Cached by Streamlit on the upload bytes, so changing widgets like the
+    report week reruns only the cheap scoring below, not this scan.
+    """
+    # Decode once and scan the buffer in place; no per-line list is ever
+    # built, so peak memory is a single copy of the export.
+    raw_text = file_bytes.decode("utf-8", errors="replace")
+
+    first_sub = {}
+    players = set()
+
+    # Prefilter: the vast majority of chat lines carry no Wordle score, so
+    # jump between "ordle" occurrences (covers "Wordle"/"wordle") with a
+    # C-level substring search and only run the regex on those lines.
+    pos = 0
+    while True:
+        hit = raw_text.find("ordle", pos)
+        if hit == -1:
+            break
+        line_start = raw_text.rfind("\n", 0, hit) + 1
+        line_end = raw_text.find("\n", hit)
+        if line_end == -1:
+            line_end = len(raw_text)
+        pos = line_end + 1
+
+        match = CHAT_PAT.match(raw_text, line_start, line_end)
+        if not match:
+            continue
+
+        try:
+            dt = parse_dt(
+                match.group("d1") or match.group("d2"),
+                match.group("t1") or match.group("t2"),
+                prefer_dmy,
+            )
+        except ValueError:
+            continue
+
+        name = match.group("name").strip()
+        puzzle = int(match.group("puzzle").replace(",", ""))
+
+        players.add(name)
+        key = (name, puzzle)
+
+        if key not in first_sub or dt < first_sub[key][0]:
+            first_sub[key] = (dt, score_from_result(match.group("result")))
+
+    return first_sub, sorted(players, key=str.lower)
 
 
 def puzzle_for_day(start_date: date, start_puzzle: int, d: date):
     return start_puzzle + (d - start_date).days
 
 
-def day_for_puzzle(start_date: date, start_puzzle: int, puzzle: int):
-    return start_date + timedelta(days=(puzzle - start_puzzle))
+@st.cache_data
+def compute_season(
+    first_sub: dict,
+    players: list,
+    season_start_date: date,
+    season_start_puzzle: int,
+    season_days: int,
+    double_dates_key: tuple,
+):
+    """Build the (player, day) score matrix, multiplier vector and season totals.
+
+    Cached separately from parse_chat: the report week is not part of the
+    key, so scrubbing it reuses the season computation and only the weekly
+    slice and output rebuild.
+    """
+    player_to_idx = {pl: i for i, pl in enumerate(players)}
+    scores = np.zeros((len(players), season_days), dtype=np.float32)
+
+    for (pl, puzzle), (dt, score) in first_sub.items():
+        offset = puzzle - season_start_puzzle
+        if 0 <= offset < season_days:
+            scores[player_to_idx[pl], offset] = score
+
+    # Per-day multiplier vector, indexed by puzzle offset from the season start.
+    double_dates = set(double_dates_key)
+    mult = np.fromiter(
+        (
+            2.0
+            if (season_start_date + timedelta(days=i)).isoformat() in double_dates
+            else 1.0
+            for i in range(season_days)
+        ),
+        dtype=np.float32,
+        count=season_days,
+    )
+
+    return scores, mult, scores @ mult
 
 
 # -----------------------------
@@ -102,58 +236,20 @@ with st.expander("Season settings", expanded=True):
     report_week = st.number_input("Week to report", min_value=1, value=1)
     prefer_dmy = st.checkbox("My WhatsApp export uses DD/MM/YYYY", value=True)
     double_text = st.text_area("Double points dates (YYYY-MM-DD)", value="")
-    double_dates = parse_double_dates(double_text)
+    double_dates, bad_dates = parse_double_dates(double_text)
+    if bad_dates:
+        st.warning(f"Ignoring invalid double-points dates: {', '.join(bad_dates)}")
 
 uploaded = st.file_uploader("Upload WhatsApp export (.txt)", type=["txt"])
 
 if not uploaded:
     st.stop()
 
-raw_text = uploaded.read().decode("utf-8", errors="replace")
-lines = raw_text.splitlines()
-
-first_sub = {}
-players = set()
-
-for line in lines:
-    match = None
-    for pattern in LINE_PATS:
-        match = pattern.match(line)
-        if match:
-            break
-
-    if not match:
-        continue
-
-    try:
-        dt = parse_dt(match.group("d"), match.group("t"), prefer_dmy)
-    except:
-        continue
-
-    msg = match.group("msg")
-    name = match.group("name").strip()
-
-    wordle_match = WORDLE_PAT.search(msg)
-    if not wordle_match:
-        continue
-
-    puzzle = int(wordle_match.group("puzzle").replace(",", ""))
-    result = wordle_match.group("result")
-
-    players.add(name)
-    key = (name, puzzle)
-
-    if key not in first_sub or dt < first_sub[key][0]:
-        first_sub[key] = (dt, result)
-
-players = sorted(players)
+first_sub, players = parse_chat(uploaded.getvalue(), prefer_dmy)
+# Lowercased once so the ranked sorts below never re-run str.lower per key.
+lower_names = np.array([pl.lower() for pl in players])
 
 season_days = int(season_weeks) * 7
-season_dates = [season_start_date + timedelta(days=i) for i in range(season_days)]
-season_puzzles = [
-    puzzle_for_day(season_start_date, int(season_start_puzzle), d)
-    for d in season_dates
-]
 
 week_start = season_start_date + timedelta(days=(int(report_week) - 1) * 7)
 week_dates = [week_start + timedelta(days=i) for i in range(7)]
@@ -162,44 +258,47 @@ week_puzzles = [
     for d in week_dates
 ]
 
-def multiplier(puzzle):
-    d = day_for_puzzle(season_start_date, int(season_start_puzzle), puzzle)
-    return 2 if d.isoformat() in double_dates else 1
-
-week_points = defaultdict(float)
-season_points = defaultdict(float)
-missing = defaultdict(list)
-
-for puzzle in season_puzzles:
-    mult = multiplier(puzzle)
-    for pl in players:
-        res = first_sub.get((pl, puzzle))
-        if res:
-            season_points[pl] += score_from_result(res[1]) * mult
-
-for puzzle in week_puzzles:
-    mult = multiplier(puzzle)
-    for pl in players:
-        res = first_sub.get((pl, puzzle))
-        if res:
-            week_points[pl] += score_from_result(res[1]) * mult
-        else:
-            missing[pl].append(puzzle)
-
-week_ranked = sorted(players, key=lambda p: (-week_points[p], p))
-season_ranked = sorted(players, key=lambda p: (-season_points[p], p))
+player_to_idx = {pl: i for i, pl in enumerate(players)}
+scores, mult, season_points = compute_season(
+    first_sub,
+    players,
+    season_start_date,
+    int(season_start_puzzle),
+    season_days,
+    tuple(sorted(double_dates)),
+)
+
+week_offset = (int(report_week) - 1) * 7
+week_slice = slice(week_offset, week_offset + 7)
+week_scores = scores[:, week_slice]
+week_points = week_scores @ mult[week_slice]
+
+# A submitted score is always >= 0.5, so a zero cell means no submission.
+# Columns beyond the season (report week past the end) also count as missing.
+missing = {}
+for i, pl in enumerate(players):
+    row = week_scores[i]
+    missing[pl] = [
+        puzzle
+        for j, puzzle in enumerate(week_puzzles)
+        if j >= row.size or not row[j]
+    ]
+
+# Sort by descending points, breaking ties case-insensitively by name.
+week_ranked = [players[i] for i in np.lexsort((lower_names, -week_points))]
+season_ranked = [players[i] for i in np.lexsort((lower_names, -season_points))]
 
 output = []
 output.append(f"🏁 Wordle League — Week {report_week}")
 output.append("")
 output.append("📊 Weekly points")
 for i, p in enumerate(week_ranked, 1):
-    output.append(f"{i}. {p}: {fmt_pts(week_points[p])}")
+    output.append(f"{i}. {p}: {fmt_pts(week_points[player_to_idx[p]])}")
 
 output.append("")
 output.append("🏆 Season total")
 for i, p in enumerate(season_ranked, 1):
-    output.append(f"{i}. {p}: {fmt_pts(season_points[p])}")
+    output.append(f"{i}. {p}: {fmt_pts(season_points[player_to_idx[p]])}")
 
 output.append("")
 output.append("❗ Missing submissions (0 points)")